@@ -1,123 +1,362 @@
 # dashboard.py
+import csv
+import io
 import json
+import os
+import threading
 import pandas as pd
 import streamlit as st
 from pathlib import Path
+from watchdog.events import FileSystemEventHandler
+from watchdog.observers import Observer
+
+from sharded_batch import RESULT_COLUMNS, SHARD_DIR, to_result_row
 
 st.set_page_config(page_title="UOB One – Customer Interest Advisor", layout="centered")
 
 st.title("UOB One – Customer Interest Advisor")
 st.caption("Select a Customer ID to view inputs and AI-generated recommendation.")
 
+REFRESH_SECONDS = 2  # how often the live view picks up records merged by the watcher
+
+# ----------------------------
+# Live results index
+# ----------------------------
+class ResultsIndex:
+    """In-memory view of the results CSV, keyed by customer_id.
+
+    Only the bytes appended since the last refresh are read and merged in, so
+    a long batch never forces a full re-read. If the file is truncated or
+    replaced (e.g. by a merge step), the index is rebuilt from scratch.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self.lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.offset = 0
+        self.inode = None
+        self.header = None
+        self.rows = {}
+        self.mtime = 0
+        self.version = 0
+        self._frame = None
+        self._frame_version = -1
+
+    def watches(self, path):
+        return Path(path).resolve() == self.path.resolve()
+
+    def refresh(self):
+        with self.lock:
+            try:
+                stat = os.stat(self.path)
+            except FileNotFoundError:
+                if self.inode is not None:
+                    self._reset()
+                return
+            if stat.st_ino != self.inode or stat.st_size < self.offset:
+                self._reset()
+                self.inode = stat.st_ino
+            self.mtime = stat.st_mtime
+            if stat.st_size == self.offset:
+                return
+
+            with open(self.path, "rb") as f:
+                f.seek(self.offset)
+                chunk = f.read(stat.st_size - self.offset)
+
+            # Stop at the last newline that closes a full record (quotes balanced),
+            # so a half-written row is left for the next refresh.
+            end = len(chunk)
+            while True:
+                end = chunk.rfind(b"\n", 0, end)
+                if end < 0:
+                    return
+                if chunk.count(b'"', 0, end) % 2 == 0:
+                    break
+            chunk = chunk[:end + 1]
+            self.offset += len(chunk)
+
+            records = list(csv.reader(io.StringIO(chunk.decode("utf-8-sig"))))
+            if self.header is None and records:
+                self.header = records.pop(0)
+            for record in records:
+                if not record:
+                    continue
+                row = dict(zip(self.header, record))
+                self.rows[row.get("customer_id", "")] = row
+            self.version += 1
+
+    def snapshot(self):
+        """DataFrame of merged rows; rebuilt only when new records have landed."""
+        with self.lock:
+            if self._frame_version != self.version:
+                # Before the header lands, expose the columns the merge below relies on
+                columns = self.header or ["customer_id", "customer_name", "snap_date"]
+                self._frame = pd.DataFrame(list(self.rows.values()), columns=columns, dtype=str)
+                self._frame_version = self.version
+            return self._frame
+
+
+class ShardIndex:
+    """In-memory view of the sharded batch partitions (shard_<i>_of_<n>.jsonl).
+
+    Partitions are append-only and flushed per customer, so each file is
+    tailed like the results CSV. Only the shard count of the most recently
+    written partition is shown, so leftovers from an older run with a
+    different count do not leak in.
+    """
+
+    def __init__(self, directory):
+        self.directory = Path(directory)
+        self.lock = threading.Lock()
+        self.files = {}
+        self.mtime = 0
+        self.version = 0
+        self._frame = None
+        self._frame_version = -1
+
+    def watches(self, path):
+        path = Path(path)
+        return path.suffix == ".jsonl" and path.parent.resolve() == self.directory.resolve()
+
+    def refresh(self):
+        with self.lock:
+            paths = set(self.directory.glob("shard_*_of_*.jsonl"))
+            changed = bool(set(self.files) - paths)
+            self.files = {p: entry for p, entry in self.files.items() if p in paths}
+
+            for path in paths:
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entry = self.files.get(path)
+                if entry is None or stat.st_ino != entry["inode"] or stat.st_size < entry["offset"]:
+                    # New run truncated the partition: start this file over
+                    entry = self.files[path] = {"inode": stat.st_ino, "offset": 0, "rows": {}}
+                    changed = True
+                entry["mtime"] = stat.st_mtime
+                if stat.st_size == entry["offset"]:
+                    continue
+
+                with open(path, "rb") as f:
+                    f.seek(entry["offset"])
+                    chunk = f.read(stat.st_size - entry["offset"])
+                end = chunk.rfind(b"\n")
+                if end < 0:
+                    continue
+                entry["offset"] += end + 1
+                for line in chunk[:end + 1].splitlines():
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # torn line left by a crashed worker
+                    # Retries append, so a later record for the same row replaces the earlier one
+                    entry["rows"][record["row"]] = to_result_row(record)
+                changed = True
+
+            if changed:
+                self.version += 1
+
+    def snapshot(self):
+        with self.lock:
+            if self._frame_version != self.version:
+                entries = list(self.files.items())
+                if entries:
+                    newest = max(entries, key=lambda item: item[1]["mtime"])[0]
+                    num_shards = newest.stem.rsplit("_of_", 1)[1]
+                    entries = [e for p, e in entries if p.stem.rsplit("_of_", 1)[1] == num_shards]
+                rows = [row for entry in entries for _, row in sorted(entry["rows"].items())]
+                self.mtime = max((entry["mtime"] for entry in entries), default=0)
+                self._frame = pd.DataFrame(rows, columns=RESULT_COLUMNS, dtype=str)
+                self._frame_version = self.version
+            return self._frame
+
+
+class RefreshHandler(FileSystemEventHandler):
+    def __init__(self, index):
+        self.index = index
+
+    def on_any_event(self, event):
+        paths = {event.src_path, getattr(event, "dest_path", "")}
+        if any(p and self.index.watches(p) for p in paths):
+            self.index.refresh()
+
+
+@st.cache_resource
+def start_watchers(results_path, shard_dir):
+    results_index = ResultsIndex(results_path)
+    shard_index = ShardIndex(shard_dir)
+    shard_index.directory.mkdir(parents=True, exist_ok=True)
+    observer = Observer()
+    for index, directory in ((results_index, results_index.path.parent), (shard_index, shard_index.directory)):
+        index.refresh()
+        observer.schedule(RefreshHandler(index), str(directory), recursive=False)
+    observer.daemon = True
+    observer.start()
+    return results_index, shard_index
+
+
+def combine_results(results_index, shard_index):
+    """(display, progress) frames from the results CSV and the live shard rows.
+
+    While a sharded run is writing (partitions newer than the CSV), progress
+    counts only the current run's shard rows; the CSV, possibly from an
+    earlier run, only fills in the display for customers not reached yet.
+    """
+    df_merged, df_shards = results_index.snapshot(), shard_index.snapshot()
+    if df_shards.empty or results_index.mtime >= shard_index.mtime:
+        return df_merged, df_merged
+    if df_merged.empty:
+        return df_shards, df_shards
+    df_display = pd.concat([df_shards, df_merged], ignore_index=True).drop_duplicates("customer_id", keep="first")
+    return df_display, df_shards
+
+
+def is_failed(row):
+    error = row.get("error", "")
+    llm_json = row.get("llm_json", "")
+    return (not pd.isna(error) and bool(str(error).strip())) or pd.isna(llm_json) or not str(llm_json).strip()
+
 # ----------------------------
 # Load data
 # ----------------------------
 customers_csv = Path("customers.csv")
 results_csv   = Path("outputs/uob_one_interest_simulation_rows.csv")
 
-if not customers_csv.exists() or not results_csv.exists():
-    st.error("Missing data. Run `generate_interest.py` first to create outputs.")
+if not customers_csv.exists():
+    st.error("Missing customers.csv. Add customers before starting a batch.")
     st.stop()
 
 df_customers = pd.read_csv(customers_csv, dtype={"customer_id": str, "snap_date": str})
-df_results   = pd.read_csv(results_csv, dtype={"customer_id": str})
-
-# Merge on customer_id (left join to show even if no result)
-df = df_customers.merge(df_results, on="customer_id", how="left", suffixes=("_inp", "_ai"))
+results_index, shard_index = start_watchers(str(results_csv), str(SHARD_DIR))
 
-# ----------------------------
-# UI – Dropdown
-# ----------------------------
-ids = df["customer_id"].dropna().unique().tolist()
+ids = df_customers["customer_id"].dropna().unique().tolist()
 if not ids:
     st.warning("No customers found in customers.csv.")
     st.stop()
 
-selected_id = st.selectbox("Customer ID", ids, index=0)
-rec = df[df["customer_id"] == selected_id].iloc[0]
 
-# ----------------------------
-# Show Inputs
-# ----------------------------
-st.subheader("Customer Inputs")
-c1, c2 = st.columns(2)
-with c1:
-    st.markdown(f"**Name:** {rec['customer_name_inp']}")
-    st.markdown(f"**ID:** {rec['customer_id']}")
-    st.markdown(f"**Snap Date:** {rec['snap_date_inp']}")
-with c2:
-    try:
-        st.markdown(f"**Avg Balance:** ${float(rec['avg_balance']):,.2f}")
-    except Exception:
-        st.markdown("**Avg Balance:** —")
-    try:
-        st.markdown(f"**Card Spend:** ${float(rec['card_spend']):,.2f}")
-    except Exception:
-        st.markdown("**Card Spend:** —")
-    try:
-        st.markdown(f"**Salary Credit:** ${float(rec['salary_credit']):,.2f}")
-    except Exception:
-        st.markdown("**Salary Credit:** —")
-    try:
-        st.markdown(f"**GIRO Count:** {int(rec['giro_count'])}")
-    except Exception:
-        st.markdown("**GIRO Count:** —")
+@st.fragment(run_every=REFRESH_SECONDS)
+def live_view():
+    # Polling fallback for missed watchdog events (e.g. NFS-mounted outputs/); cheap when nothing changed
+    results_index.refresh()
+    shard_index.refresh()
+    df_results, df_progress = combine_results(results_index, shard_index)
 
-st.divider()
+    # ----------------------------
+    # Batch progress
+    # ----------------------------
+    total = len(ids)
+    seen = df_progress[df_progress["customer_id"].isin(ids)] if not df_progress.empty else df_progress
+    failed = int(seen.apply(is_failed, axis=1).sum()) if not seen.empty else 0
+    done = len(seen) - failed
+    remaining = total - len(seen)
 
-# ----------------------------
-# AI Output (flat highlights)
-# ----------------------------
-st.subheader("AI Summary")
-bm = rec.get("banker_message", "")
-if pd.isna(bm) or not str(bm).strip():
-    st.warning("No AI summary found for this customer.")
-else:
-    st.text(bm)
-
-# Current snapshot
-st.markdown("**Current Status**")
-c3, c4, c5 = st.columns(3)
-c3.metric("Level", rec.get("current_level", ""))
-c4.metric("Tier", rec.get("current_tier", ""))
-try:
-    curr_total = float(rec.get("current_total_interest_month", 0))
-    c5.metric("Est. Interest (Month)", f"${curr_total:,.2f}")
-except Exception:
-    c5.metric("Est. Interest (Month)", "—")
+    st.progress((done + failed) / total if total else 0.0, text=f"Batch progress: {done + failed}/{total}")
+    p1, p2, p3 = st.columns(3)
+    p1.metric("Done", done)
+    p2.metric("Failed", failed)
+    p3.metric("Remaining", remaining)
 
-# ----------------------------
-# Full JSON + download
-# ----------------------------
-st.divider()
-st.subheader("Full LLM JSON")
-llm_json_str = rec.get("llm_json", "")
-if pd.isna(llm_json_str) or not str(llm_json_str).strip():
-    st.info("No JSON available.")
-else:
+    # Merge on customer_id (left join to show even if no result)
+    df = df_customers.merge(df_results, on="customer_id", how="left", suffixes=("_inp", "_ai"))
+
+    # ----------------------------
+    # UI – Dropdown
+    # ----------------------------
+    selected_id = st.selectbox("Customer ID", ids, index=0)
+    rec = df[df["customer_id"] == selected_id].iloc[0]
+
+    # ----------------------------
+    # Show Inputs
+    # ----------------------------
+    st.subheader("Customer Inputs")
+    c1, c2 = st.columns(2)
+    with c1:
+        st.markdown(f"**Name:** {rec['customer_name_inp']}")
+        st.markdown(f"**ID:** {rec['customer_id']}")
+        st.markdown(f"**Snap Date:** {rec['snap_date_inp']}")
+    with c2:
+        try:
+            st.markdown(f"**Avg Balance:** ${float(rec['avg_balance']):,.2f}")
+        except Exception:
+            st.markdown("**Avg Balance:** —")
+        try:
+            st.markdown(f"**Card Spend:** ${float(rec['card_spend']):,.2f}")
+        except Exception:
+            st.markdown("**Card Spend:** —")
+        try:
+            st.markdown(f"**Salary Credit:** ${float(rec['salary_credit']):,.2f}")
+        except Exception:
+            st.markdown("**Salary Credit:** —")
+        try:
+            st.markdown(f"**GIRO Count:** {int(rec['giro_count'])}")
+        except Exception:
+            st.markdown("**GIRO Count:** —")
+
+    st.divider()
+
+    # ----------------------------
+    # AI Output (flat highlights)
+    # ----------------------------
+    st.subheader("AI Summary")
+    bm = rec.get("banker_message", "")
+    if pd.isna(bm) or not str(bm).strip():
+        st.warning("No AI summary found for this customer.")
+    else:
+        st.text(bm)
+
+    # Current snapshot
+    st.markdown("**Current Status**")
+    c3, c4, c5 = st.columns(3)
+    c3.metric("Level", rec.get("current_level", ""))
+    c4.metric("Tier", rec.get("current_tier", ""))
     try:
-        parsed = json.loads(llm_json_str)
-        st.json(parsed)
-        st.download_button(
-            label="Download LLM JSON",
-            data=json.dumps(parsed, indent=2, ensure_ascii=False),
-            file_name=f"{rec['customer_id']}_llm_result.json",
-            mime="application/json"
-        )
+        curr_total = float(rec.get("current_total_interest_month", 0))
+        c5.metric("Est. Interest (Month)", f"${curr_total:,.2f}")
     except Exception:
-        st.code(str(llm_json_str)[:5000], language="json")
+        c5.metric("Est. Interest (Month)", "—")
+
+    # ----------------------------
+    # Full JSON + download
+    # ----------------------------
+    st.divider()
+    st.subheader("Full LLM JSON")
+    llm_json_str = rec.get("llm_json", "")
+    if pd.isna(llm_json_str) or not str(llm_json_str).strip():
+        st.info("No JSON available.")
+    else:
+        try:
+            parsed = json.loads(llm_json_str)
+            st.json(parsed)
+            st.download_button(
+                label="Download LLM JSON",
+                data=json.dumps(parsed, indent=2, ensure_ascii=False),
+                file_name=f"{rec['customer_id']}_llm_result.json",
+                mime="application/json"
+            )
+        except Exception:
+            st.code(str(llm_json_str)[:5000], language="json")
+
+
+live_view()
 
 st.divider()
 
 # Allow quick CSV downloads
 st.subheader("Data Files")
-with open(results_csv, "rb") as f:
-    st.download_button(
-        "Download Results CSV",
-        data=f,
-        file_name="uob_one_interest_simulation_rows.csv",
-        mime="text/csv"
-    )
+if results_csv.exists():
+    with open(results_csv, "rb") as f:
+        st.download_button(
+            "Download Results CSV",
+            data=f,
+            file_name="uob_one_interest_simulation_rows.csv",
+            mime="text/csv"
+        )
 with open(customers_csv, "rb") as f:
     st.download_button(
         "Download Customers CSV",
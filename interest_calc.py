@@ -0,0 +1,254 @@
+import calendar
+from datetime import date
+from decimal import Decimal, ROUND_DOWN
+
+# ----------------------------
+# Exact interest arithmetic for the One / Stash specialists.
+# Mirrors the rules the prompts hand to the LLM, but computed with Decimal so
+# the numbers can be served without waiting on a model.
+# ----------------------------
+CENT = Decimal("0.01")
+
+ONE_TIER_SIZES = (Decimal("75000"), Decimal("50000"), Decimal("25000"))
+STASH_TIER_SIZES = (Decimal("10000"), Decimal("30000"), Decimal("30000"), Decimal("30000"))
+
+ONE_SCENARIOS = ("Upgrade Level", "Top-up to Tier Cap", "Upgrade Tier")
+STASH_SCENARIOS = ("Top-up to Qualify", "Top-up to Tier Cap", "Upgrade Tier")
+
+# Upper bound on any input amount/count, checked before arithmetic so huge
+# exponents (e.g. "1e999999999") can't blow up int() or quantize()
+MAX_AMOUNT = Decimal("1e12")
+
+
+def pct(rate):
+    """'0.05%' -> Decimal('0.0005')"""
+    return Decimal(str(rate).strip().rstrip("%")) / 100
+
+
+def round_down(amount):
+    return amount.quantize(CENT, rounding=ROUND_DOWN)
+
+
+def day_count(snap_date):
+    d = date.fromisoformat(snap_date)
+    days_in_month = calendar.monthrange(d.year, d.month)[1]
+    days_in_year = 366 if calendar.isleap(d.year) else 365
+    return days_in_month, days_in_year
+
+
+def tier_caps(sizes):
+    caps, total = [], Decimal(0)
+    for size in sizes:
+        total += size
+        caps.append(total)
+    return caps
+
+
+def tier_of(balance, sizes):
+    """1-based tier the balance falls in (balances past the last cap stay in the last tier)."""
+    for i, cap in enumerate(tier_caps(sizes), 1):
+        if balance <= cap:
+            return i
+    return len(sizes)
+
+
+def split_tiers(balance, sizes):
+    """Portion of the balance sitting in each tier."""
+    parts, remaining = [], balance
+    for size in sizes:
+        part = min(max(remaining, Decimal(0)), size)
+        parts.append(part)
+        remaining -= part
+    return parts
+
+
+def monthly_interest(balance, base_rate, bonus_rates, sizes, days_in_month, days_in_year):
+    """Base + progressive bonus interest for one month, rounded down to cents."""
+    factor = Decimal(days_in_month) / Decimal(days_in_year)
+    base = balance * base_rate * factor
+    bonus = [part * rate * factor for part, rate in zip(split_tiers(balance, sizes), bonus_rates)]
+    return {
+        "base_interest_month": round_down(base),
+        "bonus_interest_month_breakdown": {
+            f"tier_{i}_amount": round_down(amount) for i, amount in enumerate(bonus, 1)
+        },
+        "total_interest_month": round_down(base + sum(bonus)),
+    }
+
+
+def to_json(value):
+    """Decimals -> floats so results can go straight through json.dumps."""
+    if isinstance(value, dict):
+        return {k: to_json(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [to_json(v) for v in value]
+    if isinstance(value, Decimal):
+        return float(value)
+    return value
+
+
+def pick_recommendation(simulations):
+    """First scenario (in priority order) with a positive gain, else None."""
+    for sim in simulations:
+        if sim["incremental_gain_vs_current"] > 0:
+            return {
+                "chosen_scenario": sim["name"],
+                "recommended_incremental_gain_vs_current": sim["incremental_gain_vs_current"],
+            }
+    return {"chosen_scenario": "None", "recommended_incremental_gain_vs_current": Decimal("0.00")}
+
+
+def non_negative(account, *fields):
+    """Decimal amounts for the given fields; negative or missing values are rejected."""
+    amounts = {}
+    for field in fields:
+        amount = Decimal(str(account[field]))
+        if not amount.is_finite() or amount < 0 or amount > MAX_AMOUNT:
+            raise ValueError(f"{field} must be a non-negative amount up to {MAX_AMOUNT:,f}, got {account[field]!r}")
+        amounts[field] = amount
+    return amounts
+
+
+def explain(current_total, new_total):
+    gain = new_total - current_total
+    return f"{new_total} - {current_total} = {gain}"
+
+# ----------------------------
+# UOB One Account
+# ----------------------------
+def one_level(amounts):
+    """Level from validated amounts; 0 means no level (card spend below S$500, so no bonus interest)."""
+    if amounts["card_spend"] < 500:
+        return 0
+    if amounts["salary_credit"] >= 1600:
+        return 3
+    if amounts["giro_count"] >= 3:
+        return 2
+    return 1
+
+
+def level_label(level):
+    return f"Level {level}" if level else "No level"
+
+
+def one_interest(balance, level, interest_rate_data, days_in_month, days_in_year):
+    base_rate = pct(interest_rate_data["Base Rate"])
+    if level:
+        bonus = interest_rate_data[f"Level {level} Bonus"]
+        bonus_rates = [pct(bonus[f"Tier {i}"]) for i in range(1, len(ONE_TIER_SIZES) + 1)]
+    else:
+        bonus_rates = [Decimal(0)] * len(ONE_TIER_SIZES)
+    return monthly_interest(balance, base_rate, bonus_rates, ONE_TIER_SIZES, days_in_month, days_in_year)
+
+
+def compute_one(customer_data, interest_rate_data):
+    """Current position and the three what-if scenarios for a One Account payload."""
+    days_in_month, days_in_year = day_count(customer_data["snap_date"])
+    account = customer_data["one_account"]
+    amounts = non_negative(account, "avg_balance", "salary_credit", "card_spend", "giro_count")
+    if amounts["giro_count"] % 1 != 0:
+        raise ValueError(f"giro_count must be a whole number, got {account['giro_count']!r}")
+    balance = amounts["avg_balance"]
+    level = one_level(amounts)
+    tier = tier_of(balance, ONE_TIER_SIZES)
+    caps = tier_caps(ONE_TIER_SIZES)
+
+    current = one_interest(balance, level, interest_rate_data, days_in_month, days_in_year)
+
+    # Level 1 with no GIRO can jump straight to Level 3 via salary credit.
+    if level == 1 and amounts["giro_count"] == 0:
+        next_level = 3
+    else:
+        next_level = min(level + 1, 3)
+    targets = [
+        (next_level, balance),
+        (level, max(balance, caps[tier - 1])),
+        (level, max(balance, caps[tier]) if tier < len(caps) else balance),
+    ]
+
+    simulations = []
+    for name, (new_level, new_balance) in zip(ONE_SCENARIOS, targets):
+        sim = one_interest(new_balance, new_level, interest_rate_data, days_in_month, days_in_year)
+        simulations.append({
+            "name": name,
+            "new_level": level_label(new_level),
+            "new_tier": f"Tier {tier_of(new_balance, ONE_TIER_SIZES)}",
+            "new_avg_balance": new_balance,
+            **sim,
+            "incremental_gain_vs_current": sim["total_interest_month"] - current["total_interest_month"],
+            "explanation": explain(current["total_interest_month"], sim["total_interest_month"]),
+        })
+
+    return {
+        "snap_date": customer_data["snap_date"],
+        "current": {
+            "avg_balance": balance,
+            "level": level_label(level),
+            "tier": f"Tier {tier}",
+            "days_in_month": days_in_month,
+            "days_in_year": days_in_year,
+            **current,
+        },
+        "simulations": simulations,
+        "recommended_action": pick_recommendation(simulations),
+    }
+
+# ----------------------------
+# UOB Stash Account
+# ----------------------------
+def stash_interest(balance, eligible, interest_rate_data, days_in_month, days_in_year):
+    base_rate = pct(interest_rate_data["Base Rate"])
+    bonus = interest_rate_data["Bonus Rate"]
+    if eligible:
+        bonus_rates = [pct(bonus[f"Tier {i}"]) for i in range(1, len(STASH_TIER_SIZES) + 1)]
+    else:
+        bonus_rates = [Decimal(0)] * len(STASH_TIER_SIZES)
+    return monthly_interest(balance, base_rate, bonus_rates, STASH_TIER_SIZES, days_in_month, days_in_year)
+
+
+def compute_stash(customer_data, interest_rate_data):
+    """Current position and the three what-if scenarios for a Stash Account payload."""
+    days_in_month, days_in_year = day_count(customer_data["snap_date"])
+    account = customer_data["stash_account"]
+    amounts = non_negative(account, "average_balance_last_month", "average_balance_this_month")
+    last_month = amounts["average_balance_last_month"]
+    balance = amounts["average_balance_this_month"]
+    tier = tier_of(balance, STASH_TIER_SIZES)
+    caps = tier_caps(STASH_TIER_SIZES)
+
+    current = stash_interest(balance, balance >= last_month, interest_rate_data, days_in_month, days_in_year)
+
+    targets = [
+        max(balance, last_month),
+        max(balance, caps[tier - 1]),
+        max(balance, caps[tier]) if tier < len(caps) else balance,
+    ]
+
+    simulations = []
+    for name, new_balance in zip(STASH_SCENARIOS, targets):
+        eligible = new_balance >= last_month
+        sim = stash_interest(new_balance, eligible, interest_rate_data, days_in_month, days_in_year)
+        simulations.append({
+            "name": name,
+            "new_tier": f"Tier {tier_of(new_balance, STASH_TIER_SIZES)}",
+            "new_average_balance_this_month": new_balance,
+            "bonus_eligible": eligible,
+            **sim,
+            "incremental_gain_vs_current": sim["total_interest_month"] - current["total_interest_month"],
+            "explanation": explain(current["total_interest_month"], sim["total_interest_month"]),
+        })
+
+    return {
+        "snap_date": customer_data["snap_date"],
+        "current": {
+            "average_balance_last_month": last_month,
+            "average_balance_this_month": balance,
+            "tier": f"Tier {tier}",
+            "bonus_eligible": balance >= last_month,
+            "days_in_month": days_in_month,
+            "days_in_year": days_in_year,
+            **current,
+        },
+        "simulations": simulations,
+        "recommended_action": pick_recommendation(simulations),
+    }
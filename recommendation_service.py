@@ -0,0 +1,344 @@
+import argparse
+import asyncio
+import json
+import logging
+import time
+import uuid
+from collections import Counter, OrderedDict
+
+from aiohttp import ClientSession, web
+
+import interest_calc
+import uob_one_account_ai
+import uob_stash_ai
+
+logger = logging.getLogger(__name__)
+
+# ----------------------------
+# Service settings
+# ----------------------------
+QUEUE_SIZE = 256            # pending narrative jobs before new requests get 429
+BATCH_SIZE = 16             # max prompts sent to the LLM in one micro-batch
+BATCH_WAIT = 0.05           # seconds to wait for a micro-batch to fill up
+NARRATIVE_CACHE_SIZE = 10000
+
+PRODUCTS = {
+    "one": {
+        "name": "UOB One Account",
+        "account_key": "one_account",
+        "compute": interest_calc.compute_one,
+        "module": uob_one_account_ai,
+    },
+    "stash": {
+        "name": "UOB Stash Account",
+        "account_key": "stash_account",
+        "compute": interest_calc.compute_stash,
+        "module": uob_stash_ai,
+    },
+}
+
+# The figures are already exact, so the LLM only writes the banker-facing words
+NARRATIVE_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "reasoning": {"type": "string"},
+        "next_steps": {"type": "array", "items": {"type": "string"}, "maxItems": 3},
+    },
+    "required": ["reasoning", "next_steps"],
+    "additionalProperties": False,
+}
+
+
+def build_narrative_prompt(product, exact):
+    spec = PRODUCTS[product]
+    return f"""
+## Role
+You are a product specialist for the {spec["name"]}. The interest figures below are already computed exactly. Your task is to explain the recommended action to a banker and write next steps the customer can take.
+
+## Constraints
+- Do not recalculate, round or change any number. Only quote numbers that appear in "Computed Figures".
+- Do not fabricate rules. Only use "Product Rules".
+- Keep the reasoning to one or two sentences and give at most 3 next steps.
+
+## Computed Figures
+{json.dumps(interest_calc.to_json(exact), indent=2)}
+
+## Product Rules
+{json.dumps(spec["module"].product_rules, indent=2)}
+
+## Return ONLY a JSON object matching this JSON Schema (no extra text):
+{json.dumps(NARRATIVE_SCHEMA, indent=2)}
+"""
+
+
+def narrative_llm(module):
+    # Same model settings as the specialist, but decoding constrained to the narrative schema
+    return module.llm.model_copy(update={"format": NARRATIVE_SCHEMA})
+
+
+class StubLLM:
+    """Stand-in for OllamaLLM used by the replay load test.
+
+    A batch costs one fixed round trip plus a small per-prompt cost, roughly
+    how a local model behaves when prompts are grouped.
+    """
+
+    def __init__(self, latency=0.2, per_prompt=0.01):
+        self.latency = latency
+        self.per_prompt = per_prompt
+
+    def invoke(self, prompt):
+        return self.batch([prompt])[0]
+
+    def batch(self, prompts, return_exceptions=False):
+        time.sleep(self.latency + self.per_prompt * len(prompts))
+        return [json.dumps({
+            "reasoning": "Stub narrative.",
+            "next_steps": ["Step 1 ...", "Step 2 ...", "Step 3 ..."],
+        })] * len(prompts)
+
+# ----------------------------
+# Narrative micro-batcher
+# ----------------------------
+def remember(app, job_id, state):
+    narratives = app["narratives"]
+    narratives[job_id] = state
+    narratives.move_to_end(job_id)
+    while len(narratives) > NARRATIVE_CACHE_SIZE:
+        narratives.popitem(last=False)
+
+
+async def next_batch(queue):
+    """Block for one job, then take whatever else arrives within BATCH_WAIT."""
+    loop = asyncio.get_running_loop()
+    batch = [await queue.get()]
+    deadline = loop.time() + BATCH_WAIT
+    while len(batch) < BATCH_SIZE:
+        timeout = deadline - loop.time()
+        if timeout <= 0:
+            break
+        try:
+            batch.append(await asyncio.wait_for(queue.get(), timeout))
+        except asyncio.TimeoutError:
+            break
+    return batch
+
+
+async def run_batch(app, batch):
+    by_product = {}
+    for job in batch:
+        by_product.setdefault(job["product"], []).append(job)
+
+    for product, jobs in by_product.items():
+        module = PRODUCTS[product]["module"]
+        prompts = [build_narrative_prompt(product, job["exact"]) for job in jobs]
+        try:
+            responses = await asyncio.to_thread(app["llms"][product].batch, prompts, return_exceptions=True)
+        except Exception as e:
+            responses = [e] * len(jobs)
+
+        for job, response in zip(jobs, responses):
+            try:
+                if isinstance(response, Exception):
+                    raise response
+                result = module.parse_response(response)
+                module.validate_response(result, NARRATIVE_SCHEMA)
+                remember(app, job["id"], {"status": "done", "result": result})
+            except Exception as e:
+                remember(app, job["id"], {"status": "error", "error": str(e)})
+
+
+async def narrative_worker(app):
+    queue = app["queue"]
+    while True:
+        batch = await next_batch(queue)
+        app["stats"]["batches"] += 1
+        app["stats"]["batched_jobs"] += len(batch)
+        try:
+            await run_batch(app, batch)
+        except Exception as e:
+            logger.exception("Narrative batch of %d jobs failed", len(batch))
+            for job in batch:
+                if app["narratives"].get(job["id"], {}).get("status") == "queued":
+                    remember(app, job["id"], {"status": "error", "error": str(e)})
+        finally:
+            # Always release the slots, otherwise the queue fills up and every request gets 429
+            for _ in batch:
+                queue.task_done()
+
+
+def start_narrative_worker(app):
+    app["worker"] = asyncio.create_task(narrative_worker(app))
+    app["worker"].add_done_callback(lambda task: restart_narrative_worker(app, task))
+
+
+def restart_narrative_worker(app, task):
+    if task.cancelled():
+        return
+    logger.error("Narrative worker stopped, restarting", exc_info=task.exception())
+    start_narrative_worker(app)
+
+# ----------------------------
+# HTTP handlers
+# ----------------------------
+async def recommend(request):
+    product = request.match_info["product"]
+    if product not in PRODUCTS:
+        raise web.HTTPNotFound(text=f"Unknown product: {product}")
+    spec = PRODUCTS[product]
+
+    try:
+        payload = await request.json()
+        customer_data = {"snap_date": payload["snap_date"], spec["account_key"]: payload[spec["account_key"]]}
+        exact = spec["compute"](customer_data, spec["module"].interest_rate_data)
+    except (ValueError, KeyError, TypeError, ArithmeticError) as e:
+        raise web.HTTPBadRequest(text=f"Invalid {product} payload: {e}")
+
+    job_id = uuid.uuid4().hex
+    body = {"id": job_id, "product": product, "exact": interest_calc.to_json(exact)}
+
+    if payload.get("narrative", True):
+        try:
+            request.app["queue"].put_nowait({"id": job_id, "product": product, "exact": exact})
+        except asyncio.QueueFull:
+            return web.json_response(
+                {"error": "Narrative queue is full, retry later."},
+                status=429,
+                headers={"Retry-After": "1"},
+            )
+        remember(request.app, job_id, {"status": "queued"})
+        body["narrative_url"] = f"/narratives/{job_id}"
+
+    return web.json_response(body)
+
+
+async def narrative(request):
+    state = request.app["narratives"].get(request.match_info["job_id"])
+    if state is None:
+        raise web.HTTPNotFound(text="Unknown narrative id")
+    return web.json_response(state)
+
+
+async def health(request):
+    app = request.app
+    return web.json_response({
+        "queued": app["queue"].qsize(),
+        "queue_size": app["queue"].maxsize,
+        **app["stats"],
+    })
+
+
+def create_app(llms=None, queue_size=QUEUE_SIZE):
+    app = web.Application()
+    app["llms"] = llms or {name: narrative_llm(spec["module"]) for name, spec in PRODUCTS.items()}
+    app["narratives"] = OrderedDict()
+    app["stats"] = Counter(batches=0, batched_jobs=0)
+
+    async def start_worker(app):
+        app["queue"] = asyncio.Queue(maxsize=queue_size)
+        start_narrative_worker(app)
+
+    async def stop_worker(app):
+        app["worker"].cancel()
+
+    app.on_startup.append(start_worker)
+    app.on_cleanup.append(stop_worker)
+    app.router.add_post("/recommend/{product}", recommend)
+    app.router.add_get("/narratives/{job_id}", narrative)
+    app.router.add_get("/health", health)
+    return app
+
+# ----------------------------
+# Replay load test (local stub LLM)
+# ----------------------------
+def load_requests(path):
+    """Each line: {"product": "one" | "stash", "snap_date": ..., "<product>_account": {...}}"""
+    requests, skipped = [], 0
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if record.get("product") not in PRODUCTS:
+                skipped += 1
+                continue
+            requests.append(record)
+    return requests, skipped
+
+
+async def replay(path, repeat, concurrency, queue_size, latency):
+    requests, skipped = load_requests(path)
+    requests = requests * repeat
+    if not requests:
+        print(f"No replayable requests in {path} (skipped {skipped}).")
+        return
+
+    stub = StubLLM(latency=latency)
+    app = create_app(llms={name: stub for name in PRODUCTS}, queue_size=queue_size)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    base_url = f"http://127.0.0.1:{port}"
+
+    statuses, latencies = Counter(), []
+    gate = asyncio.Semaphore(concurrency)
+
+    async def send(session, record):
+        body = {k: v for k, v in record.items() if k != "product"}
+        async with gate:
+            started = time.perf_counter()
+            async with session.post(f"{base_url}/recommend/{record['product']}", json=body) as resp:
+                await resp.read()
+                statuses[resp.status] += 1
+                latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    try:
+        async with ClientSession() as session:
+            await asyncio.gather(*(send(session, r) for r in requests))
+        elapsed = time.perf_counter() - started
+        await app["queue"].join()
+        drained = time.perf_counter() - started
+    finally:
+        await runner.cleanup()
+
+    latencies.sort()
+    stats = app["stats"]
+    print(f"Replayed {len(requests)} requests from {path} (skipped {skipped}) in {elapsed:.2f}s")
+    print(f"Status codes: {dict(sorted(statuses.items()))}")
+    print(
+        f"Latency p50={latencies[len(latencies) // 2] * 1000:.1f}ms "
+        f"p95={latencies[int(len(latencies) * 0.95) - 1] * 1000:.1f}ms "
+        f"max={latencies[-1] * 1000:.1f}ms"
+    )
+    if stats["batches"]:
+        print(
+            f"Narratives drained after {drained:.2f}s: {stats['batched_jobs']} jobs in "
+            f"{stats['batches']} batches (avg {stats['batched_jobs'] / stats['batches']:.1f}/batch)"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="One/Stash recommendation service")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    serve_cmd = sub.add_parser("serve", help="Run the HTTP service against the configured LLMs")
+    serve_cmd.add_argument("--host", default="127.0.0.1")
+    serve_cmd.add_argument("--port", type=int, default=8080)
+    serve_cmd.add_argument("--queue-size", type=int, default=QUEUE_SIZE)
+
+    replay_cmd = sub.add_parser("replay", help="Replay a requests file against a local stub LLM")
+    replay_cmd.add_argument("path", nargs="?", default="sample_requests.jsonl")
+    replay_cmd.add_argument("--repeat", type=int, default=100)
+    replay_cmd.add_argument("--concurrency", type=int, default=64)
+    replay_cmd.add_argument("--queue-size", type=int, default=QUEUE_SIZE)
+    replay_cmd.add_argument("--latency", type=float, default=0.2, help="Stub LLM seconds per batch")
+
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    if args.command == "serve":
+        web.run_app(create_app(queue_size=args.queue_size), host=args.host, port=args.port)
+    else:
+        asyncio.run(replay(args.path, args.repeat, args.concurrency, args.queue_size, args.latency))
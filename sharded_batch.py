@@ -0,0 +1,297 @@
+import argparse
+import csv
+import hashlib
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+
+# ----------------------------
+# Layout
+# ----------------------------
+# Every shard owns two files under SHARD_DIR, so shards can run in separate
+# processes or on separate nodes sharing the outputs/ directory:
+#   shard_<i>_of_<n>.jsonl        append-only records; the last one per customer row wins
+#   shard_<i>_of_<n>.status.json  progress + final state ("complete" / "failed")
+CUSTOMERS_CSV = Path("customers.csv")
+SHARD_DIR = Path("outputs/shards")
+RESULTS_CSV = Path("outputs/uob_one_interest_simulation_rows.csv")
+
+RESULT_COLUMNS = [
+    "customer_id", "customer_name", "snap_date", "current_level", "current_tier",
+    "current_total_interest_month", "recommended_chosen", "recommended_reason",
+    "recommended_next_steps", "banker_message", "llm_json", "error",
+]
+
+
+def shard_of(customer_id, num_shards):
+    # md5 rather than hash(): must agree across processes and machines
+    digest = hashlib.md5(str(customer_id).encode("utf-8")).hexdigest()
+    return int(digest, 16) % num_shards
+
+
+def partition_path(shard, num_shards):
+    return SHARD_DIR / f"shard_{shard}_of_{num_shards}.jsonl"
+
+
+def status_path(shard, num_shards):
+    return SHARD_DIR / f"shard_{shard}_of_{num_shards}.status.json"
+
+
+def read_status(shard, num_shards):
+    try:
+        with open(status_path(shard, num_shards), encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {"shard": shard, "num_shards": num_shards, "state": "pending"}
+
+
+def write_status(status):
+    path = status_path(status["shard"], status["num_shards"])
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({**status, "updated": datetime.now().isoformat(timespec="seconds")}, f)
+    os.replace(tmp, path)
+
+
+def load_customers(customers_csv=CUSTOMERS_CSV):
+    """Rows of customers.csv tagged with their original position."""
+    with open(customers_csv, encoding="utf-8-sig", newline="") as f:
+        return [{**row, "row": i} for i, row in enumerate(csv.DictReader(f))]
+
+
+def to_iso_date(snap_date):
+    for fmt in ("%Y-%m-%d", "%d/%m/%Y"):
+        try:
+            return datetime.strptime(snap_date, fmt).date().isoformat()
+        except ValueError:
+            continue
+    raise ValueError(f"Unrecognised snap_date: {snap_date}")
+
+
+def to_payload(row):
+    return {
+        "snap_date": to_iso_date(row["snap_date"]),
+        "one_account": {
+            "avg_balance": float(row["avg_balance"]),
+            "salary_credit": float(row["salary_credit"]),
+            "card_spend": float(row["card_spend"]),
+            "giro_count": int(row["giro_count"]),
+        },
+    }
+
+# ----------------------------
+# Shard worker
+# ----------------------------
+def load_partition(shard, num_shards):
+    """Latest record per customer row; retries append, so later lines supersede earlier ones."""
+    records = {}
+    try:
+        with open(partition_path(shard, num_shards), encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue  # torn last line from a crashed worker
+                records[record["row"]] = record
+    except FileNotFoundError:
+        pass
+    return records
+
+
+def process_row(one, row, include_explanation=False):
+    record = {"row": row["row"], "customer_id": row["customer_id"],
+              "customer_name": row["customer_name"], "snap_date": row["snap_date"]}
+    try:
+        payload = to_payload(row)
+    except (KeyError, TypeError, ValueError) as e:
+        # Bad input in customers.csv: retrying the LLM will not help
+        record.update(error=str(e), error_kind="input")
+        return record
+
+    record["snap_date"] = payload["snap_date"]
+    try:
+        prompt = one.build_prompt(payload, one.product_rules, one.interest_rate_data, include_explanation)
+        generation = one.structured_llm(include_explanation).generate([prompt]).generations[0][0]
+        parsed = one.parse_response(generation.text)
+        one.validate_response(parsed, one.output_schema(include_explanation))
+        record["result"] = parsed
+    except Exception as e:
+        record.update(error=str(e), error_kind="llm")
+    return record
+
+
+def run_shard(shard, num_shards, customers_csv=CUSTOMERS_CSV, retry_failed=False, include_explanation=False):
+    """Process one shard; with retry_failed, only customers without a good record are re-sent."""
+    import uob_one_account_ai as one
+
+    rows = [r for r in load_customers(customers_csv) if shard_of(r["customer_id"], num_shards) == shard]
+    existing = load_partition(shard, num_shards) if retry_failed else {}
+    status = {"shard": shard, "num_shards": num_shards, "state": "running",
+              "total": len(rows), "done": 0, "failed": 0, "invalid": 0}
+
+    pending = []
+    for row in rows:
+        previous = existing.get(row["row"])
+        if previous and "error" not in previous and previous["customer_id"] == row["customer_id"]:
+            status["done"] += 1
+        else:
+            pending.append(row)
+    write_status(status)
+
+    path = partition_path(shard, num_shards)
+    # Append on retry so the partition stays append-only for readers tailing it
+    mode = "a" if retry_failed else "w"
+    with open(path, mode, encoding="utf-8") as out:
+        if mode == "a" and out.tell() and not path.read_bytes().endswith(b"\n"):
+            out.write("\n")
+        for row in pending:
+            record = process_row(one, row, include_explanation)
+            if "result" in record:
+                status["done"] += 1
+            elif record["error_kind"] == "input":
+                status["invalid"] += 1
+            else:
+                status["failed"] += 1
+
+            out.write(json.dumps(record, ensure_ascii=False) + "\n")
+            out.flush()
+            write_status(status)
+            print(f"[shard {shard}/{num_shards}] {status['done'] + status['failed'] + status['invalid']}/"
+                  f"{status['total']} ({status['failed']} failed, {status['invalid']} invalid) "
+                  f"{row['customer_id']}", flush=True)
+
+    # Invalid input is reported in the merge but does not keep the shard failed
+    status["state"] = "failed" if status["failed"] else "complete"
+    write_status(status)
+    return status
+
+
+def run(num_shards, shards=None, workers=None, retry_failed=False, customers_csv=CUSTOMERS_CSV,
+        include_explanation=False):
+    SHARD_DIR.mkdir(parents=True, exist_ok=True)
+    shards = list(range(num_shards)) if shards is None else shards
+    if any(not 0 <= s < num_shards for s in shards):
+        raise SystemExit(f"Shard indexes must be between 0 and {num_shards - 1}")
+    if retry_failed:
+        shards = [s for s in shards if read_status(s, num_shards).get("state") != "complete"]
+    if not shards:
+        print("Nothing to run: all selected shards are complete.")
+        return
+
+    print(f"Running shards {shards} of {num_shards}")
+    with ProcessPoolExecutor(max_workers=workers or len(shards)) as pool:
+        futures = {
+            pool.submit(run_shard, s, num_shards, customers_csv, retry_failed, include_explanation): s for s in shards
+        }
+        for future in as_completed(futures):
+            shard = futures[future]
+            try:
+                status = future.result()
+            except Exception as e:
+                # Worker crashed before finishing; leave a status that --retry-failed picks up
+                status = {**read_status(shard, num_shards), "state": "failed", "error": str(e)}
+                write_status(status)
+            print(f"[shard {shard}/{num_shards}] {status['state']}")
+
+# ----------------------------
+# Merge
+# ----------------------------
+def result_fields(record):
+    parsed = record["result"]
+    current = parsed.get("current", {})
+    action = parsed.get("recommended_action", {})
+    steps = action.get("next_steps", [])
+    total = float(current.get("total_interest_month", 0))
+    return {
+        "current_level": current.get("level", ""),
+        "current_tier": current.get("tier", ""),
+        "current_total_interest_month": total,
+        "recommended_chosen": action.get("chosen_scenario", ""),
+        "recommended_reason": action.get("reasoning", ""),
+        "recommended_next_steps": " | ".join(steps),
+        "banker_message": (
+            f"{record['customer_name']}, you’re at {current.get('level', '')} / {current.get('tier', '')}. "
+            f"Current month interest ≈ ${total:,.2f}. "
+            f"Recommendation: {action.get('chosen_scenario', '')}. {action.get('reasoning', '')} "
+            f"Next steps: {'; '.join(steps)}"
+        ),
+        "llm_json": json.dumps(parsed, ensure_ascii=False),
+    }
+
+
+def to_result_row(record):
+    row = {col: "" for col in RESULT_COLUMNS}
+    row.update(customer_id=record["customer_id"], customer_name=record["customer_name"],
+               snap_date=record["snap_date"])
+    if "error" in record:
+        row["error"] = record["error"]
+        return row
+
+    # A malformed result (e.g. "current": null) becomes an error row instead of aborting the merge
+    try:
+        row.update(result_fields(record))
+    except (AttributeError, KeyError, TypeError, ValueError) as e:
+        row["error"] = f"Malformed result: {e}"
+    return row
+
+
+def merge(num_shards, allow_failed=False, results_csv=RESULTS_CSV):
+    states = {s: read_status(s, num_shards).get("state") for s in range(num_shards)}
+    blocking = [s for s, state in states.items() if state != "complete" and not (allow_failed and state == "failed")]
+    if blocking:
+        raise SystemExit(f"Cannot merge, shards not complete: {blocking}. Re-run with --retry-failed.")
+
+    records = []
+    for shard in range(num_shards):
+        records.extend(load_partition(shard, num_shards).values())
+    records.sort(key=lambda r: r["row"])
+
+    # Write then swap, so readers (e.g. the dashboard) never see a half-merged file
+    rows = [to_result_row(r) for r in records]
+    tmp = results_csv.with_suffix(".tmp")
+    with open(tmp, "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.DictWriter(f, fieldnames=RESULT_COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+    os.replace(tmp, results_csv)
+
+    failed = sum(1 for r in rows if r["error"])
+    print(f"Merged {len(records)} customers from {num_shards} shards ({failed} failed) into {results_csv}")
+
+
+def print_status(num_shards):
+    for shard in range(num_shards):
+        s = read_status(shard, num_shards)
+        progress = f"{s.get('done', 0) + s.get('failed', 0) + s.get('invalid', 0)}/{s.get('total', '?')}"
+        print(f"shard {shard}/{num_shards}: {s['state']:<8} {progress} "
+              f"({s.get('failed', 0)} failed, {s.get('invalid', 0)} invalid) {s.get('updated', '')}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sharded UOB One batch over customers.csv")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    run_cmd = sub.add_parser("run", help="Run shards in local worker processes")
+    run_cmd.add_argument("--shards", type=int, required=True, help="Total number of shards")
+    run_cmd.add_argument("--only", type=int, nargs="+", help="Shard indexes to run on this node (default: all)")
+    run_cmd.add_argument("--workers", type=int, help="Worker processes (default: one per shard)")
+    run_cmd.add_argument("--retry-failed", action="store_true", help="Only re-send customers whose last attempt failed")
+    run_cmd.add_argument("--customers", type=Path, default=CUSTOMERS_CSV)
+    run_cmd.add_argument("--include-explanation", action="store_true", help="Ask for per-scenario explanations")
+
+    merge_cmd = sub.add_parser("merge", help="Assemble shard partitions into the results CSV")
+    merge_cmd.add_argument("--shards", type=int, required=True)
+    merge_cmd.add_argument("--allow-failed", action="store_true", help="Merge shards with failed customers")
+
+    status_cmd = sub.add_parser("status", help="Show per-shard progress")
+    status_cmd.add_argument("--shards", type=int, required=True)
+
+    args = parser.parse_args()
+    if args.command == "run":
+        run(args.shards, args.only, args.workers, args.retry_failed, args.customers, args.include_explanation)
+    elif args.command == "merge":
+        merge(args.shards, args.allow_failed)
+    else:
+        print_status(args.shards)
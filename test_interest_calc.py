@@ -0,0 +1,117 @@
+import json
+from decimal import Decimal
+
+import pytest
+
+import interest_calc
+
+ONE_RATES = {
+    "Base Rate": "0.05%",
+    "Level 1 Bonus": {"Tier 1": "0.60%", "Tier 2": "0.00%", "Tier 3": "0.00%"},
+    "Level 2 Bonus": {"Tier 1": "0.95%", "Tier 2": "1.95%", "Tier 3": "0.00%"},
+    "Level 3 Bonus": {"Tier 1": "1.45%", "Tier 2": "2.95%", "Tier 3": "4.45%"},
+}
+
+STASH_RATES = {
+    "Base Rate": "0.05%",
+    "Bonus Rate": {"Tier 1": "0.00%", "Tier 2": "1.55%", "Tier 3": "2.15%", "Tier 4": "2.90%"},
+}
+
+
+def one(avg_balance, card_spend=700, salary_credit=2000, giro_count=3, snap_date="2025-08-31"):
+    return {
+        "snap_date": snap_date,
+        "one_account": {
+            "avg_balance": avg_balance,
+            "card_spend": card_spend,
+            "salary_credit": salary_credit,
+            "giro_count": giro_count,
+        },
+    }
+
+
+def stash(last_month, this_month, snap_date="2025-08-31"):
+    return {
+        "snap_date": snap_date,
+        "stash_account": {"average_balance_last_month": last_month, "average_balance_this_month": this_month},
+    }
+
+
+def test_one_level_3_u001():
+    result = interest_calc.compute_one(one(127000), ONE_RATES)
+    current = result["current"]
+    assert (current["level"], current["tier"]) == ("Level 3", "Tier 3")
+    assert (current["days_in_month"], current["days_in_year"]) == (31, 365)
+    assert current["base_interest_month"] == Decimal("5.39")
+    assert current["bonus_interest_month_breakdown"] == {
+        "tier_1_amount": Decimal("92.36"),
+        "tier_2_amount": Decimal("125.27"),
+        "tier_3_amount": Decimal("7.55"),
+    }
+    assert current["total_interest_month"] == Decimal("230.58")
+    assert result["recommended_action"] == {
+        "chosen_scenario": "Top-up to Tier Cap",
+        "recommended_incremental_gain_vs_current": Decimal("87.91"),
+    }
+
+
+def test_one_level_2_u002_recommends_level_upgrade():
+    result = interest_calc.compute_one(one(70000, card_spend=500, salary_credit=0, giro_count=4), ONE_RATES)
+    assert (result["current"]["level"], result["current"]["tier"]) == ("Level 2", "Tier 1")
+    assert result["current"]["total_interest_month"] == Decimal("59.45")
+    upgrade = result["simulations"][0]
+    assert (upgrade["name"], upgrade["new_level"]) == ("Upgrade Level", "Level 3")
+    assert upgrade["total_interest_month"] == Decimal("89.17")
+    assert result["recommended_action"]["chosen_scenario"] == "Upgrade Level"
+
+
+def test_one_leap_year_day_count():
+    result = interest_calc.compute_one(one(127000, snap_date="2024-02-29"), ONE_RATES)
+    assert (result["current"]["days_in_month"], result["current"]["days_in_year"]) == (29, 366)
+
+
+def test_one_no_level_below_card_spend():
+    result = interest_calc.compute_one(one(50000, card_spend=499), ONE_RATES)
+    assert result["current"]["level"] == "No level"
+    assert result["current"]["bonus_interest_month_breakdown"]["tier_1_amount"] == Decimal("0.00")
+    assert result["simulations"][0]["new_level"] == "Level 1"
+
+
+def test_stash_top_up_to_qualify():
+    result = interest_calc.compute_stash(stash(51000, 49000), STASH_RATES)
+    assert result["current"]["bonus_eligible"] is False
+    assert result["current"]["total_interest_month"] == Decimal("2.08")
+    assert result["recommended_action"] == {
+        "chosen_scenario": "Top-up to Qualify",
+        "recommended_incremental_gain_vs_current": Decimal("59.66"),
+    }
+
+
+@pytest.mark.parametrize("payload, compute, rates", [
+    (one(-1), interest_calc.compute_one, ONE_RATES),
+    (one(1000, card_spend=-5), interest_calc.compute_one, ONE_RATES),
+    (one(1000, giro_count=1.5), interest_calc.compute_one, ONE_RATES),
+    (one(1000, giro_count="1e999999999"), interest_calc.compute_one, ONE_RATES),
+    (one("1e999999999"), interest_calc.compute_one, ONE_RATES),
+    (stash(1000, -1), interest_calc.compute_stash, STASH_RATES),
+    (stash("1e999999999", 1000), interest_calc.compute_stash, STASH_RATES),
+])
+def test_rejects_invalid_amounts(payload, compute, rates):
+    with pytest.raises(ValueError):
+        compute(payload, rates)
+
+
+def test_one_accepts_whole_number_giro_written_as_decimal():
+    result = interest_calc.compute_one(one(70000, card_spend=500, salary_credit=0, giro_count="3.0"), ONE_RATES)
+    assert result["current"]["level"] == "Level 2"
+
+
+def test_one_level_1_without_giro_targets_level_3():
+    result = interest_calc.compute_one(one(50000, card_spend=500, salary_credit=0, giro_count="0.0"), ONE_RATES)
+    assert result["current"]["level"] == "Level 1"
+    assert result["simulations"][0]["new_level"] == "Level 3"
+
+
+def test_to_json_round_trips():
+    result = interest_calc.to_json(interest_calc.compute_one(one(127000), ONE_RATES))
+    assert json.loads(json.dumps(result))["current"]["total_interest_month"] == 230.58
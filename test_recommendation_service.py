@@ -0,0 +1,167 @@
+import asyncio
+import json
+import threading
+
+import pytest
+
+pytest.importorskip("aiohttp")
+pytest.importorskip("langchain_ollama")
+
+from aiohttp.test_utils import TestClient, TestServer
+
+import recommendation_service as rs
+
+ONE_BODY = {
+    "snap_date": "2025-08-31",
+    "one_account": {"avg_balance": 127000, "salary_credit": 2000, "card_spend": 700, "giro_count": 3},
+}
+STASH_BODY = {
+    "snap_date": "2025-08-31",
+    "stash_account": {"average_balance_last_month": 51000, "average_balance_this_month": 49000},
+}
+
+
+class RecordingLLM(rs.StubLLM):
+    def __init__(self, response=None):
+        super().__init__(latency=0, per_prompt=0)
+        self.batches = []
+        self.response = response
+
+    def batch(self, prompts, return_exceptions=False):
+        self.batches.append(len(prompts))
+        if self.response is not None:
+            return [self.response] * len(prompts)
+        return super().batch(prompts, return_exceptions)
+
+
+class BlockingLLM(rs.StubLLM):
+    def __init__(self):
+        super().__init__(latency=0, per_prompt=0)
+        self.release = threading.Event()
+
+    def batch(self, prompts, return_exceptions=False):
+        self.release.wait(5)
+        return super().batch(prompts, return_exceptions)
+
+
+def serve(llm, check, queue_size=rs.QUEUE_SIZE):
+    async def main():
+        app = rs.create_app(llms={name: llm for name in rs.PRODUCTS}, queue_size=queue_size)
+        async with TestClient(TestServer(app)) as client:
+            await check(app, client)
+    asyncio.run(main())
+
+
+async def narrative_of(client, body):
+    return await (await client.get(body["narrative_url"])).json()
+
+
+def test_exact_figures_returned_immediately():
+    async def check(app, client):
+        resp = await client.post("/recommend/one", json=ONE_BODY)
+        assert resp.status == 200
+        body = await resp.json()
+        assert body["exact"]["current"]["total_interest_month"] == 230.58
+        await app["queue"].join()
+        assert (await narrative_of(client, body))["status"] == "done"
+    serve(RecordingLLM(), check)
+
+
+def test_invalid_payload_is_400():
+    async def check(app, client):
+        bad = {**ONE_BODY, "one_account": {**ONE_BODY["one_account"], "avg_balance": -1}}
+        assert (await client.post("/recommend/one", json=bad)).status == 400
+        assert (await client.post("/recommend/cards", json=ONE_BODY)).status == 404
+    serve(RecordingLLM(), check)
+
+
+def test_full_queue_returns_429():
+    llm = BlockingLLM()
+
+    async def check(app, client):
+        try:
+            # First job is taken by the worker and blocks in the LLM; the second fills the queue
+            assert (await client.post("/recommend/one", json=ONE_BODY)).status == 200
+            await asyncio.sleep(rs.BATCH_WAIT * 4)
+            assert (await client.post("/recommend/one", json=ONE_BODY)).status == 200
+            resp = await client.post("/recommend/one", json=ONE_BODY)
+            assert resp.status == 429
+            assert resp.headers["Retry-After"] == "1"
+            # Exact-only requests skip the queue
+            assert (await client.post("/recommend/one", json={**ONE_BODY, "narrative": False})).status == 200
+        finally:
+            llm.release.set()
+        await app["queue"].join()
+    serve(llm, check, queue_size=1)
+
+
+def test_concurrent_requests_are_micro_batched_per_product():
+    llm = RecordingLLM()
+
+    async def check(app, client):
+        bodies = [ONE_BODY] * 5 + [STASH_BODY] * 2
+        resps = await asyncio.gather(*(
+            client.post(f"/recommend/{'one' if 'one_account' in b else 'stash'}", json=b) for b in bodies
+        ))
+        assert [r.status for r in resps] == [200] * 7
+        await app["queue"].join()
+        assert app["stats"]["batches"] == 1
+        assert sorted(llm.batches) == [2, 5]
+    serve(llm, check)
+
+
+def test_narrative_not_matching_schema_is_an_error():
+    async def check(app, client):
+        body = await (await client.post("/recommend/one", json=ONE_BODY)).json()
+        await app["queue"].join()
+        state = await narrative_of(client, body)
+        assert state["status"] == "error"
+        assert "Schema mismatch" in state["error"]
+    serve(RecordingLLM(response=json.dumps({"reasoning": "ok", "next_steps": [], "total": 1.0})), check)
+
+
+def test_worker_survives_failing_batch():
+    async def check(app, client):
+        first = await (await client.post("/recommend/one", json=ONE_BODY)).json()
+        await app["queue"].join()
+        second = await (await client.post("/recommend/one", json=ONE_BODY)).json()
+        await app["queue"].join()
+        assert (await narrative_of(client, first))["status"] == "error"
+        assert (await narrative_of(client, second))["status"] == "done"
+
+    class FailsOnce(RecordingLLM):
+        def batch(self, prompts, return_exceptions=False):
+            if not self.batches:
+                self.batches.append(len(prompts))
+                return None  # not iterable: blows up outside the per-call error handling
+            return super().batch(prompts, return_exceptions)
+
+    serve(FailsOnce(), check)
+
+
+def test_worker_restarts_after_crash(monkeypatch):
+    class Crash(BaseException):
+        pass
+
+    run_batch = rs.run_batch
+    calls = []
+
+    async def crash_once(app, batch):
+        calls.append(len(batch))
+        if len(calls) == 1:
+            raise Crash()
+        await run_batch(app, batch)
+
+    monkeypatch.setattr(rs, "run_batch", crash_once)
+
+    async def check(app, client):
+        crashed_worker = app["worker"]
+        await (await client.post("/recommend/one", json=ONE_BODY)).json()
+        await app["queue"].join()
+        await asyncio.sleep(0)
+        assert crashed_worker.done() and app["worker"] is not crashed_worker
+        body = await (await client.post("/recommend/one", json=ONE_BODY)).json()
+        await app["queue"].join()
+        assert (await narrative_of(client, body))["status"] == "done"
+
+    serve(RecordingLLM(), check)
@@ -1,5 +1,6 @@
 from dotenv import load_dotenv
 import json
+import jsonschema
 import os
 import time
 import re
@@ -7,6 +8,106 @@ from langchain_community.chat_models import ChatOpenAI
 from langchain_community.llms import Ollama
 from langchain_ollama import OllamaLLM
 
+# ----------------------------
+# Output schema (passed to Ollama structured output)
+# ----------------------------
+STRUCTURED_OUTPUT = True  # False = legacy prompt + unconstrained decoding, for before/after measurement
+INCLUDE_EXPLANATION = False  # True = ask for (and validate) a per-scenario explanation
+
+LEVELS = ["No level", "Level 1", "Level 2", "Level 3"]  # "No level": card spend below S$500
+TIERS = ["Tier 1", "Tier 2", "Tier 3"]
+SCENARIOS = ["Upgrade Level", "Top-up to Tier Cap", "Upgrade Tier"]
+
+
+def output_schema(include_explanation=False):
+    money = {"type": "number"}
+    breakdown = {
+        "type": "object",
+        "properties": {f"tier_{i}_amount": money for i in range(1, 4)},
+        "required": [f"tier_{i}_amount" for i in range(1, 4)],
+        "additionalProperties": False,
+    }
+    simulation = {
+        "type": "object",
+        "properties": {
+            "name": {"type": "string", "enum": SCENARIOS},
+            "new_level": {"type": "string", "enum": LEVELS},
+            "new_tier": {"type": "string", "enum": TIERS},
+            "new_avg_balance": money,
+            "base_interest_month": money,
+            "bonus_interest_month_breakdown": breakdown,
+            "total_interest_month": money,
+            "incremental_gain_vs_current": money,
+        },
+        "additionalProperties": False,
+    }
+    if include_explanation:
+        simulation["properties"]["explanation"] = {"type": "string"}
+    simulation["required"] = list(simulation["properties"])
+
+    return {
+        "type": "object",
+        "properties": {
+            "snap_date": {"type": "string", "pattern": r"^\d{4}-\d{2}-\d{2}$"},
+            "current": {
+                "type": "object",
+                "properties": {
+                    "avg_balance": money,
+                    "level": {"type": "string", "enum": LEVELS},
+                    "tier": {"type": "string", "enum": TIERS},
+                    "days_in_month": {"type": "integer"},
+                    "days_in_year": {"type": "integer"},
+                    "base_interest_month": money,
+                    "bonus_interest_month_breakdown": breakdown,
+                    "total_interest_month": money,
+                },
+                "required": [
+                    "avg_balance", "level", "tier", "days_in_month", "days_in_year",
+                    "base_interest_month", "bonus_interest_month_breakdown", "total_interest_month",
+                ],
+                "additionalProperties": False,
+            },
+            "simulations": {"type": "array", "items": simulation, "minItems": 3, "maxItems": 3},
+            "recommended_action": {
+                "type": "object",
+                "properties": {
+                    "chosen_scenario": {"type": "string", "enum": SCENARIOS + ["None"]},
+                    "reasoning": {"type": "string"},
+                    "recommended_incremental_gain_vs_current": money,
+                    "next_steps": {"type": "array", "items": {"type": "string"}, "maxItems": 3},
+                },
+                "required": ["chosen_scenario", "reasoning", "recommended_incremental_gain_vs_current", "next_steps"],
+                "additionalProperties": False,
+            },
+        },
+        "required": ["snap_date", "current", "simulations", "recommended_action"],
+        "additionalProperties": False,
+    }
+
+
+def legacy_output_schema():
+    """Keys the pre-schema template asked for (explanations plus a per-scenario assumption).
+
+    The template's values were placeholders like "same as current | or specify", not
+    enums, so the legacy arm is only scored on parsing and required keys.
+    """
+    schema = required_keys_only(output_schema(include_explanation=True))
+    schema["properties"]["simulations"]["items"]["required"].append("assumption")
+    return schema
+
+
+def required_keys_only(schema):
+    """Same nesting and required keys as schema, without enums, leaf types or additionalProperties."""
+    if schema.get("type") == "object":
+        return {
+            "type": "object",
+            "properties": {k: required_keys_only(v) for k, v in schema["properties"].items()},
+            "required": schema.get("required", []),
+        }
+    if schema.get("type") == "array" and schema["items"].get("type") == "object":
+        return {"type": "array", "items": required_keys_only(schema["items"])}
+    return {}
+
 # ----------------------------
 # Model setup (same pattern)
 # ----------------------------
@@ -24,8 +125,14 @@ llm = OllamaLLM(
     # top_p=0.9,            # nucleus sampling, consider tokens up to cumulative prob.
     # num_predict=512,      # max tokens to generate
     # stop=["</s>"],        # stop sequences
+    format=output_schema() if STRUCTURED_OUTPUT else "",  # constrain decoding to the JSON schema
 )
 
+
+def structured_llm(include_explanation=False):
+    """llm with decoding constrained to the same schema build_prompt() asks for."""
+    return llm.model_copy(update={"format": output_schema(include_explanation)})
+
 # ----------------------------
 # Data payloads
 # ----------------------------
@@ -100,7 +207,50 @@ interest_rate_data = {
 # ----------------------------
 # Prompt builder (mirrors your style)
 # ----------------------------
-def build_prompt(customer_data, product_rules, interest_rate_data):
+def build_prompt(customer_data, product_rules, interest_rate_data, include_explanation=False):
+    explain = (
+        "- Clearly explain the incremental gains between current vs simulated interest, showing how each gain is computed.\n"
+        if include_explanation else ""
+    )
+    return f"""
+## Role
+You are a product specialist for the UOB One Account. Your primary task is to analyze customer profiles and generate personalized recommendations to help them maximize the benefits of the UOB One Account. Your output will be used by a supervisor agent, who will combine your recommendations with insights from other products to deliver a personalized recommendation to the customer.
+
+## Constraints
+- Do not fabricate numbers or rules. Only use data in "Customer Data", "Product Rules" and "Interest Rate Data".
+- Do not recommend losses, lower balance or lower tier.
+- Use snap_date to determine the exact number of days in the month/year.
+- Round DOWN the final interest to the nearest hundredths.
+- all data and output are in SGD and computed monthly
+
+## Tasks
+1. Compute the exact current monthly base and bonus interest. Use the number of days in the month and year from snap_date and round down to the nearest hundredths.
+2. Simulate the following "what-if" scenarios to calculate potential gains:
+   1) Increase to the next LEVEL if the current is not Level 3. If current LEVEL is 1 then recommend to LEVEL 3 if there are no GIRO transactions (FIRST priority)
+   2) Increase the BALANCE up to the cap of the CURRENT tier. (SECOND priority)
+   3) Increase to the next TIER if the current is not Tier 3. (LAST priority)
+3. For each scenario, compute exact simulated base and bonus interest using the same day-count and rounding rules.
+
+## Output Requirements
+- Identify the customer’s current balance, interest tier, and level.
+{explain}- Select the recommendation with the first positive gain based on the prioritization above and write next steps to achieve higher interest.
+
+## Customer Data
+{json.dumps(customer_data, indent=2)}
+
+## Product Rules
+{json.dumps(product_rules, indent=2)}
+
+## Interest Rate Data
+{json.dumps(interest_rate_data, indent=2)}
+
+## Return ONLY a JSON object matching this JSON Schema (no extra text):
+{json.dumps(output_schema(include_explanation), indent=2)}
+"""
+
+# Pre-schema prompt, kept verbatim (invalid JSON template included) as the
+# "before" arm of the STRUCTURED_OUTPUT comparison.
+def build_legacy_prompt(customer_data, product_rules, interest_rate_data):
     return f"""
 ## Role
 You are a product specialist for the UOB One Account. Your primary task is to analyze customer profiles and generate personalized recommendations to help them maximize the benefits of the UOB One Account. Your output will be used by a supervisor agent, who will combine your recommendations with insights from other products to deliver a personalized recommendation to the customer.
@@ -215,42 +365,85 @@ You are a product specialist for the UOB One Account. Your primary task is to an
 }}
 """
 
-# ----------------------------
-# Run loop (same JSON-extract pattern)
-# ----------------------------
-results = []
-for i, cust in enumerate(customer_payloads, 1):
-    print(f"[{i}/{len(customer_payloads)}] Processing snap_date {cust.get('snap_date')}")
+def parse_response(response):
+    """Structured output is bare JSON; fall back to the old extract for free-form output."""
     try:
-        time.sleep(0.8)
-        prompt = build_prompt(cust, product_rules, interest_rate_data)
-        response = llm.invoke(prompt)
-
-        # Extract strict JSON
-        # m = re.search(r"\{.*\}\s*$", response.content, re.DOTALL)
+        return json.loads(response)
+    except json.JSONDecodeError:
         m = re.search(r"\{.*\}\s*$", response, re.DOTALL)
         if not m:
             raise ValueError("No valid JSON in LLM response.")
-        parsed = json.loads(m.group(0))
-        results.append(parsed)
-        
+        return json.loads(m.group(0))
 
-    except Exception as e:
-        print(f"Error: {e}")
-        results.append({
-            "snap_date": cust.get("snap_date"),
-            "error": str(e)
-        })
 
-# ----------------------------
-# Save
-# ----------------------------
-from datetime import datetime
-today = datetime.today()
-strftime = today.strftime("%Y%m%d%H%M%S")
+def validate_response(parsed, schema):
+    """Raise ValueError with a short message when parsed output does not match the schema."""
+    try:
+        jsonschema.validate(parsed, schema)
+    except jsonschema.ValidationError as e:
+        path = "/".join(str(p) for p in e.absolute_path) or "<root>"
+        raise ValueError(f"Schema mismatch at {path}: {e.message}") from None
+
+
+if __name__ == "__main__":
+    # ----------------------------
+    # Run loop (same JSON-extract pattern)
+    # ----------------------------
+    if STRUCTURED_OUTPUT:
+        run_llm, expected_schema = structured_llm(INCLUDE_EXPLANATION), output_schema(INCLUDE_EXPLANATION)
+        prompt_builder = lambda *args: build_prompt(*args, include_explanation=INCLUDE_EXPLANATION)
+    else:
+        run_llm, expected_schema = llm, legacy_output_schema()
+        prompt_builder = build_legacy_prompt
+
+    results = []
+    output_token_counts = []
+    parse_failures = 0
+    for i, cust in enumerate(customer_payloads, 1):
+        print(f"[{i}/{len(customer_payloads)}] Processing snap_date {cust.get('snap_date')}")
+        try:
+            time.sleep(0.8)
+            prompt = prompt_builder(cust, product_rules, interest_rate_data)
+            generation = run_llm.generate([prompt]).generations[0][0]
+
+            # Ollama reports generated tokens as eval_count
+            tokens = (generation.generation_info or {}).get("eval_count")
+            if tokens is not None:
+                output_token_counts.append(tokens)
+
+            try:
+                # Valid JSON with missing/extra/mistyped fields is still a failure
+                parsed = parse_response(generation.text)
+                validate_response(parsed, expected_schema)
+            except ValueError:
+                parse_failures += 1
+                raise
+            results.append(parsed)
+
+
+        except Exception as e:
+            print(f"Error: {e}")
+            results.append({
+                "snap_date": cust.get("snap_date"),
+                "error": str(e)
+            })
+
+    avg_tokens = sum(output_token_counts) / len(output_token_counts) if output_token_counts else 0
+    print(
+        f"Output tokens/customer: {avg_tokens:.0f} | "
+        f"Parse failures: {parse_failures}/{len(customer_payloads)} "
+        f"(structured output: {STRUCTURED_OUTPUT}, explanation: {INCLUDE_EXPLANATION})"
+    )
+
+    # ----------------------------
+    # Save
+    # ----------------------------
+    from datetime import datetime
+    today = datetime.today()
+    strftime = today.strftime("%Y%m%d%H%M%S")
 
-save_file = f"outputs/uob_one_interest_simulation_{strftime}.json"
-with open(save_file, "w", encoding="utf-8") as f:
-    json.dump(results, f, indent=2, ensure_ascii=False)
+    save_file = f"outputs/uob_one_interest_simulation_{strftime}.json"
+    with open(save_file, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=2, ensure_ascii=False)
 
-print(f"Completed. Saved final results to {save_file}")
\ No newline at end of file
+    print(f"Completed. Saved final results to {save_file}")